@@ -1,12 +1,13 @@
 """Package initialization for agent module."""
 
 from agent.conversation import ConversationState, ConversationContext
-from agent.router import IntentRouter
+from agent.router import Intent, IntentRouter
 from agent.tools import AVAILABLE_TOOLS
 
 __all__ = [
     'ConversationState',
     'ConversationContext',
+    'Intent',
     'IntentRouter',
     'AVAILABLE_TOOLS'
 ]
@@ -2,10 +2,11 @@
 Conversation state machine and context management.
 This module defines the states and tracks conversation flow.
 """
+from collections import deque
 from enum import Enum
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Deque, Tuple
 from datetime import datetime
+from time import time as _time
 
 
 class ConversationState(Enum):
@@ -24,55 +25,106 @@ class ConversationState(Enum):
     COMPLETED = "completed"                # Task completed
 
 
-@dataclass
+_NO_TRANSITIONS = frozenset()
+
+# Oldest turns are dropped past this, keeping long voice sessions bounded
+MAX_HISTORY_ENTRIES = 200
+
+# Rolling digest of turns evicted from the LLM context; oldest text drops first
+MAX_HISTORY_SUMMARY_CHARS = 1500
+
+# One history entry per turn: (epoch_ts, user_text, assistant_text, metadata)
+HistoryTurn = Tuple[float, Optional[str], Optional[str], Dict[str, Any]]
+
+
 class ConversationContext:
     """
     Maintains conversation state and history.
     This prevents booking before identification and other edge cases.
+    
+    Plain class with __slots__ rather than a dataclass: dataclass(slots=True)
+    needs Python 3.10, and the README targets 3.9.
     """
-    state: ConversationState = ConversationState.UNIDENTIFIED
-    user_phone: Optional[str] = None
-    user_name: Optional[str] = None
-    pending_appointment: Optional[Dict[str, Any]] = None
-    conversation_history: List[Dict[str, Any]] = field(default_factory=list)
-    identified_intents: List[str] = field(default_factory=list)
-    session_id: Optional[str] = None
-    started_at: datetime = field(default_factory=datetime.now)
+    __slots__ = (
+        'state',
+        'user_phone',
+        'user_name',
+        'pending_appointment',
+        'conversation_history',
+        'identified_intents',
+        'session_id',
+        'started_at',
+        'last_user_message',
+        'last_agent_response',
+        'history_summary',  # Digest of turns no longer in the LLM context
+    )
+    
+    def __init__(
+        self,
+        state: ConversationState = ConversationState.UNIDENTIFIED,
+        user_phone: Optional[str] = None,
+        user_name: Optional[str] = None,
+        pending_appointment: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[Deque[HistoryTurn]] = None,
+        identified_intents: Optional[List[str]] = None,
+        session_id: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        last_user_message: Optional[str] = None,
+        last_agent_response: Optional[str] = None,
+        history_summary: str = ""
+    ):
+        self.state = state
+        self.user_phone = user_phone
+        self.user_name = user_name
+        self.pending_appointment = pending_appointment
+        self.conversation_history = (
+            deque(maxlen=MAX_HISTORY_ENTRIES) if conversation_history is None else conversation_history
+        )
+        self.identified_intents = [] if identified_intents is None else identified_intents
+        self.session_id = session_id
+        self.started_at = datetime.now() if started_at is None else started_at
+        self.last_user_message = last_user_message
+        self.last_agent_response = last_agent_response
+        self.history_summary = history_summary
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ConversationContext({fields})"
+    
+    # Valid state transitions, shared by every context
+    _VALID_TRANSITIONS = {
+        ConversationState.UNIDENTIFIED: frozenset({ConversationState.IDENTIFIED}),
+        ConversationState.IDENTIFIED: frozenset({
+            ConversationState.BROWSING_SLOTS,
+            ConversationState.RETRIEVING,
+            ConversationState.CANCELLING,
+            ConversationState.MODIFYING,
+            ConversationState.COMPLETED
+        }),
+        ConversationState.BROWSING_SLOTS: frozenset({
+            ConversationState.BOOKING,
+            ConversationState.IDENTIFIED
+        }),
+        ConversationState.BOOKING: frozenset({
+            ConversationState.CONFIRMING,
+            ConversationState.IDENTIFIED
+        }),
+        ConversationState.CONFIRMING: frozenset({
+            ConversationState.COMPLETED,
+            ConversationState.IDENTIFIED
+        }),
+        ConversationState.RETRIEVING: frozenset({ConversationState.IDENTIFIED}),
+        ConversationState.CANCELLING: frozenset({ConversationState.IDENTIFIED}),
+        ConversationState.MODIFYING: frozenset({ConversationState.IDENTIFIED}),
+        ConversationState.COMPLETED: frozenset()  # Terminal state
+    }
     
     def can_transition_to(self, target_state: ConversationState) -> bool:
         """
         Validate if state transition is allowed.
         Prevents invalid state changes.
         """
-        # Define valid state transitions
-        valid_transitions = {
-            ConversationState.UNIDENTIFIED: [ConversationState.IDENTIFIED],
-            ConversationState.IDENTIFIED: [
-                ConversationState.BROWSING_SLOTS,
-                ConversationState.RETRIEVING,
-                ConversationState.CANCELLING,
-                ConversationState.MODIFYING,
-                ConversationState.COMPLETED
-            ],
-            ConversationState.BROWSING_SLOTS: [
-                ConversationState.BOOKING,
-                ConversationState.IDENTIFIED
-            ],
-            ConversationState.BOOKING: [
-                ConversationState.CONFIRMING,
-                ConversationState.IDENTIFIED
-            ],
-            ConversationState.CONFIRMING: [
-                ConversationState.COMPLETED,
-                ConversationState.IDENTIFIED
-            ],
-            ConversationState.RETRIEVING: [ConversationState.IDENTIFIED],
-            ConversationState.CANCELLING: [ConversationState.IDENTIFIED],
-            ConversationState.MODIFYING: [ConversationState.IDENTIFIED],
-            ConversationState.COMPLETED: []  # Terminal state
-        }
-        
-        return target_state in valid_transitions.get(self.state, [])
+        return target_state in self._VALID_TRANSITIONS.get(self.state, _NO_TRANSITIONS)
     
     def transition_to(self, target_state: ConversationState) -> bool:
         """
@@ -84,14 +136,38 @@ class ConversationContext:
             return True
         return False
     
+    def add_turn(self, user: str, assistant: str, metadata: Optional[Dict] = None):
+        """Record a full user/assistant exchange as a single history entry."""
+        self.conversation_history.append((_time(), user, assistant, metadata or {}))
+    
     def add_to_history(self, role: str, content: str, metadata: Optional[Dict] = None):
-        """Add message to conversation history."""
-        self.conversation_history.append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": metadata or {}
-        })
+        """Add a single user or assistant message as a one-sided turn."""
+        if role == "user":
+            self.conversation_history.append((_time(), content, None, metadata or {}))
+        else:
+            self.conversation_history.append((_time(), None, content, metadata or {}))
+    
+    def format_history(self) -> List[Dict[str, Any]]:
+        """Conversation history with ISO-8601 timestamps, for export/display."""
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                "user": user,
+                "assistant": assistant,
+                "metadata": metadata
+            }
+            for ts, user, assistant, metadata in self.conversation_history
+        ]
+    
+    def fold_into_summary(self, lines: List[str]):
+        """
+        Append evicted turns to the rolling history summary (FIFO),
+        keeping only the most recent MAX_HISTORY_SUMMARY_CHARS.
+        """
+        if not lines:
+            return
+        digest = ' | '.join(filter(None, (self.history_summary, *lines)))
+        self.history_summary = digest[-MAX_HISTORY_SUMMARY_CHARS:]
     
     def is_identified(self) -> bool:
         """Check if user has been identified."""
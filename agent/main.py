@@ -4,8 +4,8 @@ Integrates STT (Deepgram), TTS (Cartesia), and LLM (OpenRouter).
 """
 import asyncio
 import os
-import sys
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,16 +17,70 @@ from livekit.agents import AutoSubscribe, JobContext, WorkerOptions, cli, llm
 from livekit.agents.voice_assistant import VoiceAssistant
 from livekit.plugins import deepgram, cartesia, openai
 
-# Our custom imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from agent import ConversationContext, IntentRouter
+# Our custom imports (run from the repo root so `agent` and `database` resolve)
+from agent import ConversationContext, Intent, IntentRouter
 
 
 # Initialize router
 intent_router = IntentRouter()
 
-# Store active conversations
-active_conversations: Dict[str, ConversationContext] = {}
+# Intents the router may answer without the LLM: their entities are either
+# none or really extracted. Booking, cancel and modify still use mock
+# entities (fixed date/time, placeholder id), so those go to the LLM.
+_ROUTER_ANSWERED_INTENTS = frozenset({
+    Intent.IDENTIFY_USER,
+    Intent.FETCH_SLOTS,
+    Intent.RETRIEVE_APPOINTMENTS,
+    Intent.END_CONVERSATION,
+})
+
+# System prompt kept byte-identical across rooms so provider prompt caching can hit
+SYSTEM_PROMPT = """You are a helpful appointment booking assistant.
+You help users book, retrieve, cancel, and modify appointments.
+Always be polite and clear. Ask for phone number first if not identified.
+Keep responses concise and natural."""
+
+# Each room starts from a copy of this context
+_BASE_CHAT_CTX = llm.ChatContext(
+    messages=[llm.ChatMessage(role="system", content=SYSTEM_PROMPT)]
+)
+
+# Voice plugins, built on first use and reused by every room this worker serves
+_voice_plugins = None
+
+
+def get_voice_plugins():
+    """Return the worker's shared (stt, tts, llm) plugin instances."""
+    global _voice_plugins
+    if _voice_plugins is None:
+        # Configure speech-to-text (Deepgram)
+        stt = deepgram.STT(
+            model="nova-2-general",
+            language="en-US",
+            interim_results=True,
+            smart_format=True,
+            no_delay=True,
+            endpointing_ms=25,  # Finalize on short silence
+        )
+        
+        # Configure text-to-speech (Cartesia)
+        tts = cartesia.TTS(
+            voice=os.getenv("CARTESIA_VOICE_ID", "f9836c6e-a0bd-460e-9d3c-f7299fa60f94")
+        )
+        
+        # Configure LLM (OpenRouter with Llama)
+        llm_instance = openai.LLM(
+            model=os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3.3-70b-instruct:free"),
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            base_url="https://openrouter.ai/api/v1"
+        )
+        
+        _voice_plugins = (stt, tts, llm_instance)
+    return _voice_plugins
+
+
+# Store active conversations (released on room shutdown; TTL is a backstop for leaks)
+active_conversations: Dict[str, ConversationContext] = TTLCache(maxsize=10_000, ttl=3600)
 
 
 async def entrypoint(ctx: JobContext):
@@ -42,54 +96,55 @@ async def entrypoint(ctx: JobContext):
     conversation_context.session_id = session_id
     active_conversations[session_id] = conversation_context
     
-    # Connect to room
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    async def release_conversation():
+        active_conversations.pop(session_id, None)
     
-    # Configure speech-to-text (Deepgram)
-    stt = deepgram.STT(
-        model="nova-2-general",
-        language="en-US"
-    )
+    ctx.add_shutdown_callback(release_conversation)
     
-    # Configure text-to-speech (Cartesia)
-    tts = cartesia.TTS(
-        voice=os.getenv("CARTESIA_VOICE_ID", "f9836c6e-a0bd-460e-9d3c-f7299fa60f94")
-    )
+    # Connect to room
+    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
     
-    # Configure LLM (OpenRouter with Llama)
-    llm_instance = openai.LLM(
-        model=os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3.3-70b-instruct:free"),
-        api_key=os.getenv("OPENROUTER_API_KEY"),
-        base_url="https://openrouter.ai/api/v1"
-    )
+    # Shared STT/TTS/LLM plugins for this worker
+    stt, tts, llm_instance = get_voice_plugins()
     
     # Define assistant function for tool calling
-    async def process_user_input(user_message: str) -> str:
+    async def process_user_input(user_message: str) -> Tuple[Optional[str], Dict[str, Any]]:
         """
         Process user input through our intent router.
         This is where our state machine and tool logic kicks in.
+        Returns the spoken response and the router result; the response is
+        None when the router can't answer reliably and the LLM should.
         """
         print(f"[User] {user_message}")
         
         # Get conversation context
         context = active_conversations.get(session_id)
         if not context:
-            return "Sorry, I lost track of our conversation. Can we start over?"
+            return None, {}
+        
+        active_conversations[session_id] = context  # Refresh TTL while the session is in use
         
-        # Add to history
-        context.add_to_history("user", user_message)
+        # Classify first, so no tool runs on guessed entities
+        classification = intent_router.classify_intent(user_message, context)
+        intent = classification["intent"]
+        entities = classification["entities"]
+        if intent not in _ROUTER_ANSWERED_INTENTS:
+            return None, {}
+        if intent is Intent.IDENTIFY_USER and not entities.get("phone"):
+            return None, {}  # e.g. "my name is John": nothing to look up yet
         
-        # Route through our deterministic dispatcher
-        result = intent_router.dispatch_tool(user_message, context)
+        # Route through our deterministic dispatcher; tools make blocking DB
+        # calls, so run them off the event loop that drives the audio pipeline
+        result = await asyncio.to_thread(intent_router.validate_and_dispatch, intent, entities, context)
+        result["intent"] = intent.label
+        result["entities"] = entities
+        if not result.get("success"):
+            return None, result  # The LLM explains failures better than raw errors
         
-        # Generate response
-        if result.get("success"):
-            response = result.get("message", "Done!")
-        else:
-            response = result.get("error", "Sorry, I couldn't process that.")
+        response = result.get("message", "Done!")
         
-        # Add to history
-        context.add_to_history("assistant", response, metadata={
+        # Add the whole exchange to history
+        context.add_turn(user_message, response, metadata={
             "intent": result.get("intent"),
             "entities": result.get("entities"),
             "success": result.get("success")
@@ -97,7 +152,20 @@ async def entrypoint(ctx: JobContext):
         
         print(f"[Assistant] {response}")
         
-        return response
+        return response, result
+    
+    async def route_before_llm(assistant: VoiceAssistant, chat_ctx: llm.ChatContext):
+        """
+        Answer deterministic intents straight from the router and skip the LLM.
+        Unknown input, intents with mock entities and failed tool calls
+        fall through to an LLM reply.
+        """
+        response, result = await process_user_input(chat_ctx.messages[-1].content)
+        if response is None:
+            return None  # Default LLM reply
+        
+        await assistant.say(response, allow_interruptions=True)
+        return False  # Router already answered; no LLM inference this turn
     
     # Create voice assistant
     assistant = VoiceAssistant(
@@ -105,18 +173,9 @@ async def entrypoint(ctx: JobContext):
         stt=stt,
         llm=llm_instance,
         tts=tts,
-        chat_ctx=llm.ChatContext(
-            messages=[
-                llm.ChatMessage(
-                    role="system",
-                    content="""You are a helpful appointment booking assistant. 
-                    You help users book, retrieve, cancel, and modify appointments.
-                    Always be polite and clear. Ask for phone number first if not identified.
-                    Keep responses concise and natural."""
-                )
-            ]
-        ),
+        chat_ctx=_BASE_CHAT_CTX.copy(),
         fnc_ctx=None,  # We handle functions through our router
+        before_llm_cb=route_before_llm,
     )
     
     # Start the assistant
@@ -129,7 +188,7 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     """
     Start the LiveKit agent.
-    Usage: python agent/main.py start
+    Usage (from the repo root): python -m agent.main start
     """
     cli.run_app(
         WorkerOptions(
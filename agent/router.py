@@ -2,10 +2,123 @@
 Intent classification and deterministic tool dispatcher.
 Two-layer approach: LLM classifies intent → Python validates and executes.
 """
-from typing import Dict, Any, Optional
+from enum import IntEnum
+from typing import Dict, Any, Optional, List, Tuple, Union
 from agent.conversation import ConversationContext, ConversationState
 from agent.tools import AVAILABLE_TOOLS
-import json
+import re
+
+
+class Intent(IntEnum):
+    """
+    Router intents. Values index the router's dispatch table,
+    so they must follow the order of the tools below; UNKNOWN stays last.
+    """
+    IDENTIFY_USER = 0
+    FETCH_SLOTS = 1
+    BOOK_APPOINTMENT = 2
+    RETRIEVE_APPOINTMENTS = 3
+    CANCEL_APPOINTMENT = 4
+    MODIFY_APPOINTMENT = 5
+    END_CONVERSATION = 6
+    UNKNOWN = 7
+    
+    @property
+    def label(self) -> str:
+        """String name used for tools, results, logs and the frontend."""
+        return self.name.lower()
+
+
+# String facade for callers that still pass intent names
+_INTENT_BY_LABEL: Dict[str, Intent] = {intent.label: intent for intent in Intent}
+
+
+# Compiled once at import; entity extraction runs on every user turn
+_PHONE_RE = re.compile(r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b')
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+# Word after the last "my name is" / "i'm" (applied to the lowercased message)
+_MY_NAME_IS_RE = re.compile(r".*my name is\s+(\S+)", re.S)
+_IM_NAME_RE = re.compile(r".*i'm\s+(\S+)", re.S)
+
+# Mock classifier keywords, checked in priority order against the message tokens
+_INTENT_KEYWORDS: List[Tuple[Intent, frozenset]] = [
+    (Intent.IDENTIFY_USER, frozenset({
+        'phone', 'phones', 'telephone', 'number', 'numbers', 'identify'
+    })),
+    (Intent.FETCH_SLOTS, frozenset({
+        'available', 'unavailable', 'slots', 'timeslots', 'when', 'whenever', 'times'
+    })),
+    (Intent.BOOK_APPOINTMENT, frozenset({
+        'book', 'books', 'booked', 'booking', 'bookings',
+        'schedule', 'schedules', 'scheduled', 'scheduling',
+        'appointment', 'appointments'
+    })),
+    (Intent.RETRIEVE_APPOINTMENTS, frozenset({
+        'show', 'shows', 'showing', 'shown',
+        'list', 'lists', 'listed', 'listing',
+        'retrieve', 'retrieves', 'retrieved', 'retrieving'
+    })),
+    (Intent.CANCEL_APPOINTMENT, frozenset({
+        'cancel', 'cancels', 'cancelled', 'canceled', 'cancelling', 'canceling', 'cancellation',
+        'delete', 'deletes', 'deleted', 'deleting'
+    })),
+    (Intent.MODIFY_APPOINTMENT, frozenset({
+        'modify', 'modified', 'modifying',
+        'change', 'changes', 'changed', 'changing',
+        'reschedule', 'rescheduled', 'rescheduling'
+    })),
+    (Intent.END_CONVERSATION, frozenset({
+        'bye', 'goodbye', 'end', 'ends', 'ended', 'ending',
+        'finish', 'finished', 'finishing'
+    })),
+]
+
+# Multi-word phrases: (gating token, phrase), only scanned when the token is present
+_INTENT_PHRASES: Dict[Intent, Tuple[str, str]] = {
+    Intent.IDENTIFY_USER: ("name", "my name is"),
+    Intent.RETRIEVE_APPOINTMENTS: ("appointments", "my appointments"),
+}
+
+
+def _compile_keyword_index(
+    intent_keywords: List[Tuple[Intent, frozenset]],
+    intent_phrases: Dict[Intent, Tuple[str, str]]
+) -> Tuple[Dict[str, int], List[Tuple[int, str, str]]]:
+    """
+    Specialize the classifier for a fixed keyword table: a flattened
+    keyword -> priority dict, so one pass over the tokens finds the winning
+    intent, plus the phrase checks sorted by priority.
+    """
+    keyword_priority = {}
+    for priority, (_, keywords) in enumerate(intent_keywords):
+        for keyword in keywords:
+            # A keyword listed under several intents keeps the highest-priority one
+            keyword_priority.setdefault(keyword, priority)
+    phrase_priority = sorted(
+        (priority, *intent_phrases[intent])
+        for priority, (intent, _) in enumerate(intent_keywords)
+        if intent in intent_phrases
+    )
+    return keyword_priority, phrase_priority
+
+
+# Compiled once at import
+_KEYWORD_PRIORITY, _PHRASE_PRIORITY = _compile_keyword_index(_INTENT_KEYWORDS, _INTENT_PHRASES)
+
+
+# State requirements per intent, checked before any tool runs
+_REQUIRES_IDENTIFIED = frozenset({
+    Intent.FETCH_SLOTS,
+    Intent.BOOK_APPOINTMENT,
+    Intent.RETRIEVE_APPOINTMENTS,
+    Intent.CANCEL_APPOINTMENT,
+    Intent.MODIFY_APPOINTMENT,
+})
+_VALID = {"valid": True}
+_NOT_IDENTIFIED = {
+    "valid": False,
+    "message": "Please provide your phone number first so I can help you."
+}
 
 
 class IntentRouter:
@@ -16,6 +129,10 @@ class IntentRouter:
     
     def __init__(self):
         self.tool_functions = AVAILABLE_TOOLS
+        # Tool per Intent value; UNKNOWN falls just past the end
+        self._dispatch = tuple(
+            self.tool_functions[intent.label] for intent in Intent if intent is not Intent.UNKNOWN
+        )
     
     def classify_intent(self, user_message: str, context: ConversationContext) -> Dict[str, Any]:
         """
@@ -23,70 +140,47 @@ class IntentRouter:
         For now, uses simple keyword matching.
         """
         user_message_lower = user_message.lower()
+        tokens = set(_TOKEN_RE.findall(user_message_lower))
         
-        # Simple keyword-based intent detection (mock)
-        if any(word in user_message_lower for word in ['phone', 'number', 'identify', 'my name is']):
-            return {
-                "intent": "identify_user",
-                "entities": self._extract_phone_and_name(user_message)
-            }
-        
-        elif any(word in user_message_lower for word in ['available', 'slots', 'when', 'times']):
-            return {
-                "intent": "fetch_slots",
-                "entities": {}
-            }
-        
-        elif any(word in user_message_lower for word in ['book', 'schedule', 'appointment']):
-            return {
-                "intent": "book_appointment",
-                "entities": self._extract_booking_details(user_message)
-            }
-        
-        elif any(word in user_message_lower for word in ['my appointments', 'show', 'list', 'retrieve']):
-            return {
-                "intent": "retrieve_appointments",
-                "entities": {}
-            }
-        
-        elif any(word in user_message_lower for word in ['cancel', 'delete']):
-            return {
-                "intent": "cancel_appointment",
-                "entities": {"appointment_id": "mock_id"}
-            }
-        
-        elif any(word in user_message_lower for word in ['modify', 'change', 'reschedule']):
-            return {
-                "intent": "modify_appointment",
-                "entities": {"appointment_id": "mock_id"}
-            }
+        # Simple keyword-based intent detection (mock), highest priority wins
+        keyword_priority = _KEYWORD_PRIORITY
+        no_match = len(_INTENT_KEYWORDS)
+        best = min(
+            (keyword_priority[token] for token in tokens if token in keyword_priority),
+            default=no_match
+        )
+        for priority, gate, phrase in _PHRASE_PRIORITY:
+            if priority >= best:
+                break
+            if gate in tokens and phrase in user_message_lower:
+                best = priority
+                break
         
-        elif any(word in user_message_lower for word in ['bye', 'end', 'goodbye', 'finish']):
-            return {
-                "intent": "end_conversation",
-                "entities": {}
-            }
+        intent = _INTENT_KEYWORDS[best][0] if best < no_match else Intent.UNKNOWN
         
+        if intent is Intent.IDENTIFY_USER:
+            entities = self._extract_phone_and_name(user_message)
+        elif intent is Intent.BOOK_APPOINTMENT:
+            entities = self._extract_booking_details(user_message)
+        elif intent in (Intent.CANCEL_APPOINTMENT, Intent.MODIFY_APPOINTMENT):
+            entities = {"appointment_id": "mock_id"}
         else:
-            return {
-                "intent": "unknown",
-                "entities": {}
-            }
+            entities = {}
+        
+        return {
+            "intent": intent,
+            "entities": entities
+        }
     
     def _extract_phone_and_name(self, message: str) -> Dict[str, Any]:
         """Mock entity extraction for phone and name."""
-        import re
-        
         # Extract phone number (simple pattern)
-        phone_pattern = r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b'
-        phone_match = re.search(phone_pattern, message)
+        phone_match = _PHONE_RE.search(message)
         
         # Extract name (look for "my name is" or "I'm")
-        name = None
-        if "my name is" in message.lower():
-            name = message.lower().split("my name is")[-1].strip().split()[0].capitalize()
-        elif "i'm" in message.lower():
-            name = message.lower().split("i'm")[-1].strip().split()[0].capitalize()
+        lowered = message.lower()
+        name_match = _MY_NAME_IS_RE.match(lowered) or _IM_NAME_RE.match(lowered)
+        name = name_match.group(1).capitalize() if name_match else None
         
         return {
             "phone": phone_match.group() if phone_match else None,
@@ -104,26 +198,29 @@ class IntentRouter:
     
     def validate_and_dispatch(
         self,
-        intent: str,
+        intent: Union[Intent, str],
         entities: Dict[str, Any],
         context: ConversationContext
     ) -> Dict[str, Any]:
         """
         Deterministic dispatcher: validates state and executes tool.
         This prevents LLM hallucinations from breaking the flow.
+        Accepts an Intent or its string label.
         """
-        
-        # Check if intent is valid
-        if intent not in self.tool_functions:
-            if intent == "unknown":
+        if not isinstance(intent, Intent):
+            if intent not in _INTENT_BY_LABEL:
                 return {
                     "success": False,
-                    "error": "I didn't understand that. Could you please rephrase?",
-                    "suggestions": self._get_suggestions(context)
+                    "error": f"Unknown intent: {intent}"
                 }
+            intent = _INTENT_BY_LABEL[intent]
+        
+        # Check if intent is valid (UNKNOWN is past the end of the table)
+        if intent >= len(self._dispatch):
             return {
                 "success": False,
-                "error": f"Unknown intent: {intent}"
+                "error": "I didn't understand that. Could you please rephrase?",
+                "suggestions": self._get_suggestions(context)
             }
         
         # State-based validation BEFORE executing tool
@@ -136,14 +233,14 @@ class IntentRouter:
             }
         
         # Execute the tool function
-        tool_function = self.tool_functions[intent]
+        tool_function = self._dispatch[intent]
         
         try:
             # Call tool with validated entities
             result = tool_function(context, **entities)
             
             # Track intent in context
-            context.identified_intents.append(intent)
+            context.identified_intents.append(intent.label)
             
             return result
             
@@ -151,43 +248,34 @@ class IntentRouter:
             # Handle missing or invalid parameters
             return {
                 "success": False,
-                "error": f"Invalid parameters for {intent}: {str(e)}",
+                "error": f"Invalid parameters for {intent.label}: {str(e)}",
                 "required_params": self._get_required_params(intent)
             }
         except Exception as e:
             # Catch any other errors
             return {
                 "success": False,
-                "error": f"Error executing {intent}: {str(e)}"
+                "error": f"Error executing {intent.label}: {str(e)}"
             }
     
-    def _validate_state_for_intent(self, intent: str, context: ConversationContext) -> Dict[str, Any]:
+    def _validate_state_for_intent(self, intent: Intent, context: ConversationContext) -> Dict[str, Any]:
         """
         Validate if current state allows this intent.
         Critical for preventing edge cases.
+        Returned dicts may be shared constants; treat them as read-only.
         """
-        
         # identify_user can only be called when UNIDENTIFIED
-        if intent == "identify_user":
-            if context.state != ConversationState.UNIDENTIFIED:
-                return {
-                    "valid": False,
-                    "message": f"You're already identified as {context.user_name or context.user_phone}."
-                }
-        
-        # Most other tools require identification
-        elif intent in ["fetch_slots", "book_appointment", "retrieve_appointments", 
-                       "cancel_appointment", "modify_appointment"]:
-            if not context.is_identified():
-                return {
-                    "valid": False,
-                    "message": "Please provide your phone number first so I can help you."
-                }
+        if intent is Intent.IDENTIFY_USER and context.state != ConversationState.UNIDENTIFIED:
+            return {
+                "valid": False,
+                "message": f"You're already identified as {context.user_name or context.user_phone}."
+            }
         
-        # end_conversation can be called anytime
-        # No restrictions
+        # Most other tools require identification; end_conversation can be called anytime
+        if intent in _REQUIRES_IDENTIFIED and not context.is_identified():
+            return _NOT_IDENTIFIED
         
-        return {"valid": True}
+        return _VALID
     
     def _get_suggestions(self, context: ConversationContext) -> list:
         """Provide helpful suggestions based on current state."""
@@ -202,13 +290,13 @@ class IntentRouter:
         else:
             return ["Continue with your current request or say 'help'"]
     
-    def _get_required_params(self, intent: str) -> list:
+    def _get_required_params(self, intent: Intent) -> list:
         """Return required parameters for a given intent."""
         params_map = {
-            "identify_user": ["phone"],
-            "book_appointment": ["date", "time"],
-            "cancel_appointment": ["appointment_id"],
-            "modify_appointment": ["appointment_id"],
+            Intent.IDENTIFY_USER: ["phone"],
+            Intent.BOOK_APPOINTMENT: ["date", "time"],
+            Intent.CANCEL_APPOINTMENT: ["appointment_id"],
+            Intent.MODIFY_APPOINTMENT: ["appointment_id"],
         }
         return params_map.get(intent, [])
     
@@ -226,7 +314,7 @@ class IntentRouter:
         result = self.validate_and_dispatch(intent, entities, context)
         
         # Add intent info to result for frontend display
-        result["intent"] = intent
+        result["intent"] = intent.label
         result["entities"] = entities
         
         return result
@@ -2,22 +2,63 @@
 Tool implementations with database integration.
 Each tool validates state and returns structured responses.
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timedelta, time
+from functools import lru_cache
+import calendar
 import re
-import sys
-import os
-
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agent.conversation import ConversationContext, ConversationState
 from database import db
 
 
 # Hardcoded available slots (9 AM to 5 PM, weekdays)
-AVAILABLE_HOURS = list(range(9, 17))  # 9:00 to 16:00
-AVAILABLE_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+AVAILABLE_HOURS = frozenset(range(9, 17))  # 9:00 to 16:00
+AVAILABLE_DAYS = frozenset({'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'})
+_AVAILABLE_HOURS_ORDERED = tuple(sorted(AVAILABLE_HOURS))  # Slot grid iteration order
+
+# Phone normalization: strip separators in one pass, then validate
+_PHONE_STRIP = str.maketrans('', '', '- ()')
+_PHONE_VALIDATE = re.compile(r'^\+?1?\d{10,}$')
+
+
+@lru_cache(maxsize=7)
+def _slot_offsets(start_weekday: int) -> Tuple[Tuple[int, int], ...]:
+    """
+    (day_offset, hour) pairs of open slots for the 7 days after a given weekday.
+    Depends only on the weekday, so there are at most 7 distinct grids.
+    """
+    offsets = []
+    for day_offset in range(1, 8):
+        day_name = calendar.day_name[(start_weekday + day_offset) % 7]
+        
+        if day_name in AVAILABLE_DAYS:
+            for hour in _AVAILABLE_HOURS_ORDERED:
+                # Mock: exclude some random slots as "booked"
+                if not (hour == 12 or (day_offset == 1 and hour in (9, 10))):
+                    offsets.append((day_offset, hour))
+    return tuple(offsets)
+
+
+# Rolling 7-day slot grid, rebuilt lazily the first time it's read on a new day
+_SLOT_TEMPLATE_CACHE: Dict[str, Any] = {"date": None, "slots": []}
+
+
+def _slot_template(today) -> List[Dict[str, Any]]:
+    """Return the shared slot grid for the 7 days after `today`."""
+    if _SLOT_TEMPLATE_CACHE["date"] != today:
+        # Generate mock slots for next 7 days (excluding booked ones - mock)
+        _SLOT_TEMPLATE_CACHE["slots"] = [
+            {
+                "date": (today + timedelta(days=day_offset)).isoformat(),
+                "time": f"{hour:02d}:00",
+                "available": True
+            }
+            for day_offset, hour in _slot_offsets(today.weekday())
+        ]
+        _SLOT_TEMPLATE_CACHE["date"] = today
+    
+    return _SLOT_TEMPLATE_CACHE["slots"]
 
 
 def identify_user(context: ConversationContext, phone: str, name: Optional[str] = None) -> Dict[str, Any]:
@@ -27,8 +68,8 @@ def identify_user(context: ConversationContext, phone: str, name: Optional[str]
     Transition to: IDENTIFIED
     """
     # Validate phone number format (basic validation)
-    phone = phone.strip().replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
-    if not re.match(r'^\+?1?\d{10,}$', phone):
+    phone = phone.strip().translate(_PHONE_STRIP)
+    if not _PHONE_VALIDATE.match(phone):
         return {
             "success": False,
             "error": "Invalid phone number format. Please provide a valid 10-digit phone number.",
@@ -63,23 +104,7 @@ def fetch_slots(context: ConversationContext, date: Optional[str] = None) -> Dic
     
     context.transition_to(ConversationState.BROWSING_SLOTS)
     
-    # Generate mock slots for next 7 days (excluding booked ones - mock)
-    slots = []
-    today = datetime.now().date()
-    
-    for day_offset in range(1, 8):
-        check_date = today + timedelta(days=day_offset)
-        day_name = check_date.strftime('%A')
-        
-        if day_name in AVAILABLE_DAYS:
-            for hour in AVAILABLE_HOURS:
-                # Mock: exclude some random slots as "booked"
-                if not (hour == 12 or (day_offset == 1 and hour in [9, 10])):
-                    slots.append({
-                        "date": check_date.isoformat(),
-                        "time": f"{hour:02d}:00",
-                        "available": True
-                    })
+    slots = _slot_template(datetime.now().date())
     
     return {
         "success": True,
@@ -20,26 +20,36 @@ from livekit.agents import (
     llm,
 )
 from livekit.agents.voice_assistant import VoiceAssistant
-from livekit.plugins import deepgram, cartesia, openai
+from livekit.plugins import deepgram, cartesia, openai, silero
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def prewarm(proc: JobProcess):
+    """Load the VAD model once per worker process, before any job runs."""
+    # 8 kHz is enough for phone-band speech and halves VAD work per window
+    proc.userdata["vad"] = silero.VAD.load(sample_rate=8000, force_cpu=True)
+
+
 async def entrypoint(ctx: JobContext):
     """
     Main entrypoint when participant joins room.
     """
     logger.info(f"Agent starting for room: {ctx.room.name}")
     
-    # Connect to the room
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    # Connect to the room in the background while the local pipeline is built
+    connect_task = asyncio.create_task(ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY))
     
     # Initialize Speech-to-Text (Deepgram)
     stt = deepgram.STT(
         model="nova-2",
         language="en-US",
+        interim_results=True,
+        smart_format=True,
+        no_delay=True,
+        endpointing_ms=25,  # Finalize on short silence
     )
     
     # Initialize Text-to-Speech (Cartesia)
@@ -88,6 +98,8 @@ Current available slots: 9 AM to 5 PM, Monday-Friday.
         chat_ctx=initial_ctx,
     )
     
+    await connect_task
+    
     # Start the assistant
     assistant.start(ctx.room)
     
@@ -108,6 +120,7 @@ if __name__ == "__main__":
         WorkerOptions(
             entrypoint_fnc=entrypoint,
             request_fnc=request_fnc,
+            prewarm_fnc=prewarm,
         )
     )
 
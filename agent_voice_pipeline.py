@@ -4,22 +4,28 @@ This uses the NEW pipeline-based approach (not callbacks)
 """
 from typing import Optional
 import asyncio
+import hashlib
 import os
 import logging
-from dotenv import load_dotenv
+import re
+import orjson
+from cachetools import TTLCache
+from config import CFG, load_env_once
 
 # Load environment
-load_dotenv()
+load_env_once()
 
 # LiveKit imports (v1.3.12+)
 from livekit.agents import (
+    NOT_GIVEN,
     AutoSubscribe,
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
 )
 from livekit import agents, rtc
-from livekit.plugins import deepgram, cartesia, openai
+from livekit.plugins import deepgram, cartesia, openai, silero
 
 # Our logic (OUTSIDE the voice pipeline)
 from agent.conversation import ConversationContext, ConversationState
@@ -31,6 +37,49 @@ from livekit.agents import llm
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Streamed reply text is handed on at sentence ends, or after this many chunks
+_SENT_END_RE = re.compile(r'[.?!]\s*$')
+_MAX_BUFFERED_CHUNKS = 80
+
+# UI updates arriving within this window share one data-channel frame
+UI_COALESCE_SECONDS = float(CFG.ui_coalesce_ms) / 1000
+
+# Replies are reused within one session for an identical user turn, state,
+# caller and previous reply; tool-calling turns are never cached. The cache
+# is per agent instance, so one caller's reply never reaches another.
+RESPONSE_CACHE_TTL_SECONDS = 600
+RESPONSE_CACHE_MAX_ENTRIES = 128
+_NORMALIZE_RE = re.compile(r"[^a-z0-9' ]+")
+
+# Chat context bounds: once it passes MAX items, keep the newest KEEP items
+# (plus the instructions) and fold the rest into the rolling summary. The
+# gap means truncation, and the prefix change it causes, is occasional.
+MAX_CHAT_ITEMS = 40
+KEEP_CHAT_ITEMS = 20
+
+# Static system prompt. Keep it byte-identical across sessions and turns so
+# providers can serve it (plus the tool schemas after it) from prompt cache;
+# per-session state is appended later in the context, never spliced in here.
+AGENT_INSTRUCTIONS = """You are a helpful AI appointment assistant.
+
+Your role:
+- Help users identify themselves (ALWAYS call identify_user with their phone number)
+- Show available appointment slots (call fetch_slots)
+- Book, modify, or cancel appointments using the provided tools
+- Be friendly, concise, and professional
+
+CRITICAL RULES:
+- ALWAYS call identify_user first with the user's phone number before any other operation
+- NEVER make up or hallucinate appointment information
+- ONLY use information returned from the tool calls
+- If a tool returns an error, explain it to the user
+- After booking, ALWAYS call retrieve_appointments to confirm
+
+Important:
+- Always get the user's phone number first before any booking
+- Confirm all appointment details before booking
+- Use the tools - don't make up information!"""
+
 
 class AppointmentAgent:
     """
@@ -103,98 +152,375 @@ class AppointmentAgent:
         logger.info(f"UI update: {data}")
 
 
+def _normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return ' '.join(_NORMALIZE_RE.sub(' ', text.lower()).split())
+
+
+class CachingAgent(agents.voice.Agent):
+    """
+    Voice Agent that answers repeated user turns from an in-memory cache
+    instead of re-hitting the LLM, feeds session state to the LLM
+    after the static prompt prefix, keeps the chat context bounded, and
+    tracks its own reply sentence by sentence as it streams, pushing
+    each sentence to the frontend over the room's data channel
+    """
+    
+    def __init__(self, conversation_ctx: ConversationContext, room: Optional[rtc.Room] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._conversation = conversation_ctx
+        self._room = room  # UI updates go out on this room's data channel
+        self._last_sent_state = {}  # Context summary the frontend already has
+        self._reply_id = 0  # Tags every frame of one agent reply
+        self._pending_updates = []  # UI updates waiting for the coalescing timer
+        self._flush_handle = None
+        self._publish_tasks = set()
+        self._response_cache = TTLCache(maxsize=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL_SECONDS)
+        self._state_message_id = None  # Current "Session state" message in chat_ctx
+        self._synced_state = None  # Its text, to skip no-op updates
+    
+    async def on_enter(self):
+        """Seed the session-state message once the agent is active."""
+        await self.sync_session_state()
+    
+    async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage):
+        """
+        Leave turn_ctx exactly as the framework built it: any added or removed
+        item makes it differ from the context a preemptive reply was generated
+        from, and that reply is then thrown away. Trimming long histories
+        edits the agent's own chat context instead and applies from next turn.
+        """
+        if len(self.chat_ctx.items) > MAX_CHAT_ITEMS:
+            await self._evict_old_turns()
+    
+    async def _evict_old_turns(self):
+        """
+        FIFO-truncate the chat context, folding evicted user/assistant
+        messages into ConversationContext.history_summary
+        """
+        chat_ctx = self.chat_ctx.copy()
+        before = chat_ctx.messages()
+        chat_ctx.truncate(max_items=KEEP_CHAT_ITEMS)
+        kept = {item.id for item in chat_ctx.items}
+        self._conversation.fold_into_summary([
+            f"{m.role}: {m.text_content}"
+            for m in before
+            if m.id not in kept and m.role in ('user', 'assistant') and m.text_content
+        ])
+        await self.update_chat_ctx(chat_ctx)
+        
+        # The summary changed, and the old state message may have been evicted
+        self._synced_state = None
+        await self.sync_session_state()
+    
+    def _session_state_text(self) -> str:
+        summary = self._conversation.get_context_summary()
+        state = ', '.join(
+            f"{k}={v}" for k, v in summary.items()
+            if v is not None and k != 'session_duration'  # Ticks every second
+        )
+        content = f"Session state: {state}"
+        if self._conversation.history_summary:
+            content += f"\nEarlier in this call: {self._conversation.history_summary}"
+        return content
+    
+    async def sync_session_state(self):
+        """
+        Keep one "Session state" system message in the agent's chat context.
+        It is replaced, at the end of the context, only when the state text
+        changes, which happens when a tool runs; the instructions and earlier
+        turns stay a stable, cacheable prefix.
+        """
+        content = self._session_state_text()
+        if content == self._synced_state:
+            return
+        
+        chat_ctx = self.chat_ctx.copy()
+        if self._state_message_id is not None and chat_ctx.get_by_id(self._state_message_id) is not None:
+            chat_ctx.remove(self._state_message_id)
+        self._state_message_id = chat_ctx.add_message(role='system', content=content).id
+        self._synced_state = content
+        await self.update_chat_ctx(chat_ctx)
+    
+    def _cache_key(self, chat_ctx: llm.ChatContext) -> Optional[str]:
+        """
+        Key for the pending turn, or None when it must go to the LLM
+        (last item isn't a user message, e.g. a tool result follow-up)
+        """
+        messages = chat_ctx.messages()
+        if not messages or messages[-1].role != 'user':
+            return None
+        user_text = messages[-1].text_content
+        if not user_text:
+            return None
+        previous = next((m.text_content or '' for m in reversed(messages[:-1]) if m.role == 'assistant'), '')
+        conversation = self._conversation
+        raw = '\x1f'.join((
+            _normalize(user_text),
+            conversation.state.value,
+            conversation.user_phone or '',
+            conversation.user_name or '',
+            conversation.history_summary,
+            _normalize(previous),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+    
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        key = self._cache_key(chat_ctx)
+        if key is not None:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                logger.info("💾 LLM response cache hit")
+                yield cached
+                return
+        
+        parts = []
+        called_tool = False
+        async for chunk in agents.voice.Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+            if isinstance(chunk, llm.ChatChunk) and chunk.delta:
+                if chunk.delta.tool_calls:
+                    called_tool = True
+                if chunk.delta.content:
+                    parts.append(chunk.delta.content)
+            elif isinstance(chunk, str):
+                parts.append(chunk)
+            yield chunk
+        
+        if key is not None and parts and not called_tool:
+            self._response_cache[key] = ''.join(parts)
+    
+    async def transcription_node(self, text, model_settings):
+        """
+        Pass the reply text through unchanged, handing each complete sentence
+        to _on_reply_sentence as it streams in instead of after the whole
+        reply. Text still buffered when the user barges in is dropped.
+        """
+        self._reply_id += 1
+        reply_id = self._reply_id
+        chunks = []
+        reply = []
+        async for chunk in agents.voice.Agent.default.transcription_node(self, text, model_settings):
+            yield chunk
+            chunks.append(chunk)
+            if _SENT_END_RE.search(chunk) or len(chunks) >= _MAX_BUFFERED_CHUNKS:
+                reply.append(''.join(chunks))
+                chunks.clear()
+                await self._on_reply_sentence(reply_id, reply[-1], ''.join(reply))
+        if chunks:
+            reply.append(''.join(chunks))
+            await self._on_reply_sentence(reply_id, reply[-1], ''.join(reply))
+    
+    async def _on_reply_sentence(self, reply_id: int, sentence: str, reply_so_far: str):
+        """Log one flushed sentence of the agent's reply and track the reply."""
+        logger.info(f"Agent responding: {sentence}")
+        self._conversation.last_agent_response = reply_so_far
+        
+        # A full snapshot first, then only the fields that changed since the
+        # last frame; consecutive deltas of one reply coalesce into one
+        # data-channel frame. session_duration ticks every second, so it
+        # only goes out with snapshots.
+        current = self._conversation.get_context_summary()
+        if self._last_sent_state:
+            patch = {
+                k: v for k, v in current.items()
+                if k != 'session_duration' and v != self._last_sent_state.get(k)
+            }
+            await self.send_ui_update({
+                'type': 'agent_response_delta', 'reply_id': reply_id, 'text': sentence, 'patch': patch
+            })
+        else:
+            await self.send_ui_update({
+                'type': 'agent_response', 'reply_id': reply_id, 'text': sentence, 'state': current
+            })
+        self._last_sent_state = current
+    
+    def reset_ui_state(self):
+        """Forget what the frontend has seen, e.g. after it reconnects; the next update is a full snapshot."""
+        self._last_sent_state = {}
+    
+    async def send_ui_update(self, data: dict):
+        """
+        Queue an update for the frontend. Updates within UI_COALESCE_SECONDS
+        go out as one data-channel frame; full snapshots flush immediately.
+        """
+        self._pending_updates.append(data)
+        if data.get('type') == 'agent_response':
+            self._flush_ui_updates()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                UI_COALESCE_SECONDS, self._flush_ui_updates
+            )
+    
+    def _flush_ui_updates(self):
+        """Merge queued updates and send them as a single frame."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_updates:
+            return
+        
+        # Consecutive deltas of the same reply collapse into one: texts
+        # joined, patches merged
+        merged = []
+        for update in self._pending_updates:
+            last = merged[-1] if merged else None
+            if (last and last.get('type') == update.get('type') == 'agent_response_delta'
+                    and last['reply_id'] == update['reply_id']):
+                merged[-1] = {
+                    'type': 'agent_response_delta',
+                    'reply_id': update['reply_id'],
+                    'text': last['text'] + update['text'],
+                    'patch': {**last['patch'], **update['patch']},
+                }
+            else:
+                merged.append(update)
+        self._pending_updates = []
+        
+        frame = merged[0] if len(merged) == 1 else {'type': 'batch', 'updates': merged}
+        self._publish_ui_frame(orjson.dumps(frame))
+    
+    def _publish_ui_frame(self, payload: bytes):
+        """Send one encoded frame via LiveKit data channel (reliable delivery)"""
+        if self._room is None or not self._room.isconnected():
+            logger.info(f"UI update (room not connected): {payload.decode()}")
+            return
+        task = asyncio.create_task(self._room.local_participant.publish_data(payload, reliable=True))
+        self._publish_tasks.add(task)  # Keep a reference until the send finishes
+        task.add_done_callback(self._on_frame_published)
+    
+    def _on_frame_published(self, task: asyncio.Task):
+        self._publish_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"UI update failed: {task.exception()}")
+
+
+def prewarm(proc: JobProcess):
+    """
+    Runs once per worker process before any job is assigned.
+    Loads the VAD model and builds STT/LLM/TTS up front, while the
+    process waits for its job, so the first user turn doesn't pay
+    model-load and client setup cost.
+    """
+    # 8 kHz windows are half the samples of the 16 kHz default and plenty for
+    # phone-band speech; SILERO_VAD_ONNX_PATH swaps in e.g. an int8-quantized model
+    proc.userdata["vad"] = silero.VAD.load(
+        sample_rate=8000,
+        force_cpu=True,
+        onnx_file_path=CFG.silero_vad_onnx_path or NOT_GIVEN,
+    )
+    proc.userdata["stt"] = deepgram.STT(
+        api_key=CFG.deepgram_api_key,
+        model='nova-2',
+        language='en-US',
+        # Stream interim results and finalize on short silence; the plugin
+        # also sends Deepgram's Finalize as soon as VAD reports end of speech
+        interim_results=True,
+        smart_format=True,
+        no_delay=True,
+        endpointing_ms=25,
+        utterance_end_ms=1000,  # Backup end-of-turn when noise defeats endpointing
+    )
+    proc.userdata["llm"] = openai.LLM(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=CFG.openrouter_api_key,
+        model="openai/gpt-oss-20b:free",  # Free model with reasoning support
+        # Several tool calls can arrive in one response, saving LLM round
+        # trips; the entrypoint's tool_lock still executes them in order
+        parallel_tool_calls=True,
+    )
+    proc.userdata["tts"] = cartesia.TTS(
+        api_key=CFG.cartesia_api_key,
+        voice=CFG.cartesia_voice_id,
+    )
+
+
 async def entrypoint(ctx: JobContext):
     """
     Main entrypoint - uses LiveKit Voice Agent with AgentSession
     """
     logger.info(f"🎙️ Voice Agent connecting to room: {ctx.room.name}")
     
-    # Connect to room
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
-    
-    logger.info(f"📡 Connected to room: {ctx.room.name}")
+    # Connect to room in the background; agent/plugin setup below is local
+    # work, so it overlaps the connection round-trip
+    connect_task = asyncio.create_task(ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY))
     
     # Create conversation context
     conversation_ctx = ConversationContext()
     
     # Define LLM function tools
+    # Tools that hit the database run in a worker thread so DB round-trips
+    # don't stall the event loop driving STT/TTS audio. The LLM may emit
+    # several calls in one response and AgentSession runs them concurrently;
+    # they all share conversation_ctx and the appointments cache, so the lock
+    # runs them one at a time, in the order the calls were issued. Each tool
+    # then refreshes the session-state message if it changed the state.
+    tool_lock = asyncio.Lock()
+    
     @llm.function_tool()
     async def identify_user(phone: str, name: Optional[str] = None):
         """Identify the user by their phone number. Must be called before any other operation."""
-        result = appointment_tools.identify_user(conversation_ctx, phone, name)
-        logger.info(f"🔧 identify_user called: {result}")
-        return result
+        async with tool_lock:
+            result = appointment_tools.identify_user(conversation_ctx, phone, name)
+            logger.info(f"🔧 identify_user called: {result}")
+            await assistant.sync_session_state()
+            return result
     
     @llm.function_tool()
     async def fetch_slots(date: Optional[str] = None):
         """Fetch available appointment slots. User must be identified first."""
-        result = appointment_tools.fetch_slots(conversation_ctx, date)
-        logger.info(f"🔧 fetch_slots called: {result}")
-        return result
+        async with tool_lock:
+            result = appointment_tools.fetch_slots(conversation_ctx, date)
+            logger.info(f"🔧 fetch_slots called: {result}")
+            await assistant.sync_session_state()
+            return result
     
     @llm.function_tool()
     async def book_appointment(date: str, time: str, notes: Optional[str] = None):
         """Book an appointment for the identified user at the specified date and time."""
-        result = appointment_tools.book_appointment(conversation_ctx, date, time, notes)
-        logger.info(f"🔧 book_appointment called: {result}")
-        return result
+        async with tool_lock:
+            result = await asyncio.to_thread(appointment_tools.book_appointment, conversation_ctx, date, time, notes)
+            logger.info(f"🔧 book_appointment called: {result}")
+            await assistant.sync_session_state()
+            return result
     
     @llm.function_tool()
     async def retrieve_appointments():
         """Get all appointments for the current user."""
-        result = appointment_tools.retrieve_appointments(conversation_ctx)
-        logger.info(f"🔧 retrieve_appointments called: {result}")
-        return result
+        async with tool_lock:
+            result = await asyncio.to_thread(appointment_tools.retrieve_appointments, conversation_ctx)
+            logger.info(f"🔧 retrieve_appointments called: {result}")
+            await assistant.sync_session_state()
+            return result
     
     @llm.function_tool()
     async def cancel_appointment(appointment_id: str):
         """Cancel an existing appointment by ID."""
-        result = appointment_tools.cancel_appointment(conversation_ctx, appointment_id)
-        logger.info(f"🔧 cancel_appointment called: {result}")
-        return result
+        async with tool_lock:
+            result = await asyncio.to_thread(appointment_tools.cancel_appointment, conversation_ctx, appointment_id)
+            logger.info(f"🔧 cancel_appointment called: {result}")
+            await assistant.sync_session_state()
+            return result
     
     @llm.function_tool()
     async def modify_appointment(appointment_id: str, new_date: Optional[str] = None, new_time: Optional[str] = None):
         """Modify an existing appointment's date or time."""
-        result = appointment_tools.modify_appointment(conversation_ctx, appointment_id, new_date, new_time)
-        logger.info(f"🔧 modify_appointment called: {result}")
-        return result
+        async with tool_lock:
+            result = await asyncio.to_thread(
+                appointment_tools.modify_appointment, conversation_ctx, appointment_id, new_date, new_time
+            )
+            logger.info(f"🔧 modify_appointment called: {result}")
+            await assistant.sync_session_state()
+            return result
     
     # Create the Voice Agent with tools
-    assistant = agents.voice.Agent(
-        instructions="""You are a helpful AI appointment assistant.
-
-Your role:
-- Help users identify themselves (ALWAYS call identify_user with their phone number)
-- Show available appointment slots (call fetch_slots)
-- Book, modify, or cancel appointments using the provided tools
-- Be friendly, concise, and professional
-
-CRITICAL RULES:
-- ALWAYS call identify_user first with the user's phone number before any other operation
-- NEVER make up or hallucinate appointment information
-- ONLY use information returned from the tool calls
-- If a tool returns an error, explain it to the user
-- After booking, ALWAYS call retrieve_appointments to confirm
-
-Important:
-- Always get the user's phone number first before any booking
-- Confirm all appointment details before booking
-- Use the tools - don't make up information!""",
-        stt=deepgram.STT(
-            api_key=os.getenv('DEEPGRAM_API_KEY'),
-            model='nova-2',
-            language='en-US',
-        ),
-        llm=openai.LLM(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv('OPENROUTER_API_KEY'),
-            model="openai/gpt-oss-20b:free",  # Free model with reasoning support
-        ),
-        tts=cartesia.TTS(
-            api_key=os.getenv('CARTESIA_API_KEY'),
-            voice=os.getenv('CARTESIA_VOICE_ID', 'f9836c6e-a0bd-460e-9d3c-f7299fa60f94'),
-        ),
+    assistant = CachingAgent(
+        conversation_ctx,
+        room=ctx.room,
+        instructions=AGENT_INSTRUCTIONS,
+        vad=ctx.proc.userdata["vad"],
+        stt=ctx.proc.userdata["stt"],
+        llm=ctx.proc.userdata["llm"],
+        tts=ctx.proc.userdata["tts"],
         tools=[
             identify_user,
             fetch_slots,
@@ -205,6 +531,12 @@ Important:
         ]
     )
     
+    await connect_task
+    logger.info(f"📡 Connected to room: {ctx.room.name}")
+    
+    # A (re)joining frontend has no UI state yet; start it from a full snapshot
+    ctx.room.on("participant_connected", lambda participant: assistant.reset_ui_state())
+    
     # Create AgentSession and start the agent
     logger.info("🚀 Starting voice agent session with tools...")
     session = agents.voice.AgentSession()
@@ -228,6 +560,7 @@ if __name__ == "__main__":
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
         )
     )
 
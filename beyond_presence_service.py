@@ -2,15 +2,19 @@
 Beyond Presence Avatar Service
 Handles Beyond Presence API integration for lip-synced avatars with LiveKit
 """
-import os
+import orjson
 import requests
-from dotenv import load_dotenv
 
-load_dotenv()
+from config import CFG
+from http_session import session as _session
 
-BEYOND_PRESENCE_API_KEY = os.getenv('BEYOND_PRESENCE_API_KEY')
 BEYOND_PRESENCE_API_BASE = "https://api.bey.dev/v1"
 
+_HEADERS = {
+    "x-api-key": CFG.beyond_presence_api_key,
+    "Content-Type": "application/json"
+}
+
 
 def get_avatars():
     """
@@ -19,15 +23,10 @@ def get_avatars():
     Returns:
         dict: List of available avatars
     """
-    headers = {
-        "x-api-key": BEYOND_PRESENCE_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
     try:
-        response = requests.get(
+        response = _session.get(
             f"{BEYOND_PRESENCE_API_BASE}/avatars",
-            headers=headers,
+            headers=_HEADERS,
             timeout=10
         )
         response.raise_for_status()
@@ -55,11 +54,6 @@ def create_livekit_session(avatar_id, livekit_url, livekit_token):
     Returns:
         dict: Session details including video stream URL
     """
-    headers = {
-        "x-api-key": BEYOND_PRESENCE_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "avatar_id": avatar_id,
         "url": livekit_url,
@@ -67,10 +61,10 @@ def create_livekit_session(avatar_id, livekit_url, livekit_token):
     }
     
     try:
-        response = requests.post(
+        response = _session.post(
             f"{BEYOND_PRESENCE_API_BASE}/sessions",
-            headers=headers,
-            json=payload,
+            headers=_HEADERS,  # Already declares application/json
+            data=orjson.dumps(payload),
             timeout=10
         )
         response.raise_for_status()
@@ -104,15 +98,10 @@ def get_session_status(session_id):
     Returns:
         dict: Session status details
     """
-    headers = {
-        "x-api-key": BEYOND_PRESENCE_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
     try:
-        response = requests.get(
+        response = _session.get(
             f"{BEYOND_PRESENCE_API_BASE}/sessions/{session_id}",
-            headers=headers,
+            headers=_HEADERS,
             timeout=10
         )
         response.raise_for_status()
@@ -141,15 +130,10 @@ def delete_session(session_id):
     Returns:
         dict: Deletion status
     """
-    headers = {
-        "x-api-key": BEYOND_PRESENCE_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
     try:
-        response = requests.delete(
+        response = _session.delete(
             f"{BEYOND_PRESENCE_API_BASE}/sessions/{session_id}",
-            headers=headers,
+            headers=_HEADERS,
             timeout=10
         )
         response.raise_for_status()
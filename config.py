@@ -0,0 +1,48 @@
+"""
+Process-wide configuration
+Reads .env and the environment once at import; everything else
+references the frozen CFG instead of calling os.getenv per request
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+from dotenv import load_dotenv
+
+
+def load_env_once():
+    """
+    Load .env once per process family. The marker is inherited by forked
+    gunicorn workers and child processes, which then skip the re-parse.
+    It is only set once a .env was actually found, so a child started
+    from a directory that has one still loads it.
+    """
+    if not os.environ.get('_DOTENV_LOADED') and load_dotenv():
+        os.environ['_DOTENV_LOADED'] = '1'
+
+
+load_env_once()
+
+
+def _env(name: str, default: Optional[str] = None):
+    """Dataclass field populated from an environment variable."""
+    return field(default_factory=lambda: os.getenv(name, default))
+
+
+@dataclass(frozen=True)
+class Config:
+    """Immutable snapshot of the settings the services read."""
+    # Avatar providers
+    beyond_presence_api_key: Optional[str] = _env('BEYOND_PRESENCE_API_KEY')
+    tavus_api_key: Optional[str] = _env('TAVUS_API_KEY')
+    tavus_replica_id: str = _env('TAVUS_REPLICA_ID', 'r9fa0878977a')
+    
+    # Voice pipeline
+    openrouter_api_key: Optional[str] = _env('OPENROUTER_API_KEY')
+    deepgram_api_key: Optional[str] = _env('DEEPGRAM_API_KEY')
+    cartesia_api_key: Optional[str] = _env('CARTESIA_API_KEY')
+    cartesia_voice_id: str = _env('CARTESIA_VOICE_ID', 'f9836c6e-a0bd-460e-9d3c-f7299fa60f94')
+    silero_vad_onnx_path: Optional[str] = _env('SILERO_VAD_ONNX_PATH')
+    ui_coalesce_ms: str = _env('UI_COALESCE_MS', '50')  # Data-channel batching window
+
+
+CFG = Config()
@@ -1,30 +1,68 @@
 """
 Supabase database client and operations.
 Backend-only access - frontend NEVER writes to database directly.
+
+The client is synchronous. Async callers (the voice agents) must run
+AppointmentDB methods through asyncio.to_thread so a DB round-trip never
+stalls the event loop driving audio; methods are safe to call from
+several worker threads at once.
 """
+import atexit
+import importlib.util
 import os
+import threading
 from typing import Optional, List, Dict, Any
 from datetime import datetime, date, time
-from dotenv import load_dotenv
+from cachetools import TTLCache
+from config import load_env_once
 
 # For testing without actual Supabase initially
 MOCK_MODE = False
 
 try:
-    from supabase import create_client, Client
-    load_dotenv()
+    import httpx
+    from supabase import create_client, Client, ClientOptions
+except ImportError:
+    MOCK_MODE = True
+    supabase = None
+else:
+    load_env_once()
     
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     
     if SUPABASE_URL and SUPABASE_KEY:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # One pooled keep-alive HTTP client for every PostgREST call in the
+        # process (agent tools, token server, test scripts), so requests
+        # reuse warm connections instead of paying TCP/TLS setup. HTTP/2
+        # needs the h2 extra (httpx[http2]); without it, stay on HTTP/1.1
+        # rather than fail.
+        _http_client = httpx.Client(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            timeout=httpx.Timeout(30.0, connect=2.0),
+        )
+        atexit.register(_http_client.close)
+        supabase: Client = create_client(
+            SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=_http_client)
+        )
     else:
         MOCK_MODE = True
         supabase = None
-except ImportError:
-    MOCK_MODE = True
-    supabase = None
+
+# Postgres unique_violation, raised by idx_appointments_active_slot when a
+# write would put two 'booked' appointments in the same slot
+SLOT_CONFLICT_CODE = "23505"
+
+# Short-lived cache for get_user_appointments, keyed by (user_phone, status).
+# Writes through this instance drop that user's entries.
+APPOINTMENTS_CACHE_TTL_SECONDS = 30
+APPOINTMENTS_CACHE_MAX_ENTRIES = 1024
+
+
+def _is_slot_conflict(error: Exception) -> bool:
+    """True if a postgrest error is the double-booking unique violation."""
+    return getattr(error, "code", None) == SLOT_CONFLICT_CODE
 
 
 class AppointmentDB:
@@ -37,6 +75,22 @@ class AppointmentDB:
         self.client = supabase
         self.mock_mode = MOCK_MODE
         self._mock_appointments = []  # Mock storage for testing
+        # Mock indexes: id -> appointment, booked (date, time) -> id, phone -> ids
+        self._mock_by_id: Dict[str, Dict[str, Any]] = {}
+        self._mock_by_slot: Dict[tuple, str] = {}
+        self._mock_by_user: Dict[str, List[str]] = {}
+        self._appointments_cache = TTLCache(
+            maxsize=APPOINTMENTS_CACHE_MAX_ENTRIES, ttl=APPOINTMENTS_CACHE_TTL_SECONDS
+        )
+        # Guards the appointments cache and the mock indexes; tools call in
+        # from worker threads
+        self._cache_lock = threading.Lock()
+    
+    def _invalidate(self, user_phone: str):
+        """Drop cached appointment lists for a user after a write."""
+        with self._cache_lock:
+            for key in [k for k in self._appointments_cache if k[0] == user_phone]:
+                self._appointments_cache.pop(key, None)
     
     def create_appointment(
         self,
@@ -52,43 +106,35 @@ class AppointmentDB:
         """
         if self.mock_mode:
             # Mock implementation
-            appointment = {
-                "id": f"mock_{len(self._mock_appointments) + 1}",
-                "user_phone": user_phone,
-                "user_name": user_name,
-                "appointment_date": appointment_date,
-                "appointment_time": appointment_time,
-                "status": "booked",
-                "notes": notes,
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Check for double-booking (mock)
-            for appt in self._mock_appointments:
-                if (appt["appointment_date"] == appointment_date and
-                    appt["appointment_time"] == appointment_time and
-                    appt["status"] == "booked"):
+            with self._cache_lock:
+                appointment = {
+                    "id": f"mock_{len(self._mock_appointments) + 1}",
+                    "user_phone": user_phone,
+                    "user_name": user_name,
+                    "appointment_date": appointment_date,
+                    "appointment_time": appointment_time,
+                    "status": "booked",
+                    "notes": notes,
+                    "created_at": datetime.now().isoformat()
+                }
+                
+                # Check for double-booking (mock)
+                slot = (appointment_date, appointment_time)
+                if slot in self._mock_by_slot:
                     return {
                         "success": False,
                         "error": "This time slot is already booked. Please choose another time."
                     }
-            
-            self._mock_appointments.append(appointment)
-            return {"success": True, "appointment": appointment}
+                
+                self._mock_appointments.append(appointment)
+                self._mock_by_id[appointment["id"]] = appointment
+                self._mock_by_slot[slot] = appointment["id"]
+                self._mock_by_user.setdefault(user_phone, []).append(appointment["id"])
+                return {"success": True, "appointment": appointment}
         
         try:
-            # Check for existing booking at this time (double-booking prevention)
-            existing = self.client.table("appointments").select("*").eq(
-                "appointment_date", appointment_date
-            ).eq("appointment_time", appointment_time).eq("status", "booked").execute()
-            
-            if existing.data:
-                return {
-                    "success": False,
-                    "error": "This time slot is already booked. Please choose another time."
-                }
-            
-            # Create appointment
+            # Single round-trip: the unique index on booked slots rejects
+            # double-booking atomically, so no separate conflict SELECT
             result = self.client.table("appointments").insert({
                 "user_phone": user_phone,
                 "user_name": user_name,
@@ -98,9 +144,15 @@ class AppointmentDB:
                 "notes": notes
             }).execute()
             
+            self._invalidate(user_phone)
             return {"success": True, "appointment": result.data[0]}
             
         except Exception as e:
+            if _is_slot_conflict(e):
+                return {
+                    "success": False,
+                    "error": "This time slot is already booked. Please choose another time."
+                }
             return {"success": False, "error": str(e)}
     
     def get_user_appointments(
@@ -114,14 +166,21 @@ class AppointmentDB:
         """
         if self.mock_mode:
             # Mock implementation
-            appointments = [
-                appt for appt in self._mock_appointments
-                if appt["user_phone"] == user_phone
-            ]
-            if status:
-                appointments = [a for a in appointments if a["status"] == status]
-            
-            return {"success": True, "appointments": appointments}
+            with self._cache_lock:
+                appointments = [
+                    self._mock_by_id[appt_id]
+                    for appt_id in self._mock_by_user.get(user_phone, ())
+                ]
+                if status:
+                    appointments = [a for a in appointments if a["status"] == status]
+                
+                return {"success": True, "appointments": appointments}
+        
+        cache_key = (user_phone, status)
+        with self._cache_lock:
+            cached = self._appointments_cache.get(cache_key)
+        if cached is not None:
+            return {"success": True, "appointments": list(cached)}
         
         try:
             query = self.client.table("appointments").select("*").eq("user_phone", user_phone)
@@ -130,7 +189,9 @@ class AppointmentDB:
                 query = query.eq("status", status)
             
             result = query.execute()
-            return {"success": True, "appointments": result.data}
+            with self._cache_lock:
+                self._appointments_cache[cache_key] = result.data
+            return {"success": True, "appointments": list(result.data)}
             
         except Exception as e:
             return {"success": False, "error": str(e), "appointments": []}
@@ -142,36 +203,35 @@ class AppointmentDB:
         """
         if self.mock_mode:
             # Mock implementation
-            for appt in self._mock_appointments:
-                if appt["id"] == appointment_id:
-                    if appt["user_phone"] != user_phone:
-                        return {
-                            "success": False,
-                            "error": "You don't have permission to cancel this appointment."
-                        }
-                    appt["status"] = "cancelled"
-                    return {"success": True, "appointment": appt}
-            
-            return {"success": False, "error": "Appointment not found."}
+            with self._cache_lock:
+                appt = self._mock_by_id.get(appointment_id)
+                if appt is None:
+                    return {"success": False, "error": "Appointment not found."}
+                if appt["user_phone"] != user_phone:
+                    return {
+                        "success": False,
+                        "error": "You don't have permission to cancel this appointment."
+                    }
+                if appt["status"] == "booked":
+                    self._mock_by_slot.pop((appt["appointment_date"], appt["appointment_time"]), None)
+                appt["status"] = "cancelled"
+                return {"success": True, "appointment": appt}
         
         try:
-            # Verify ownership
-            appointment = self.client.table("appointments").select("*").eq(
-                "id", appointment_id
-            ).eq("user_phone", user_phone).execute()
+            # Update status; filtering on user_phone verifies ownership in the
+            # same round-trip
+            result = self.client.table("appointments").update({
+                "status": "cancelled",
+                "updated_at": datetime.now().isoformat()
+            }).eq("id", appointment_id).eq("user_phone", user_phone).execute()
             
-            if not appointment.data:
+            if not result.data:
                 return {
                     "success": False,
                     "error": "Appointment not found or you don't have permission to cancel it."
                 }
             
-            # Update status
-            result = self.client.table("appointments").update({
-                "status": "cancelled",
-                "updated_at": datetime.now().isoformat()
-            }).eq("id", appointment_id).execute()
-            
+            self._invalidate(user_phone)
             return {"success": True, "appointment": result.data[0]}
             
         except Exception as e:
@@ -190,80 +250,64 @@ class AppointmentDB:
         """
         if self.mock_mode:
             # Mock implementation
-            for appt in self._mock_appointments:
-                if appt["id"] == appointment_id:
-                    if appt["user_phone"] != user_phone:
-                        return {
-                            "success": False,
-                            "error": "You don't have permission to modify this appointment."
-                        }
-                    
-                    # Check for conflicts if changing date/time
-                    check_date = new_date or appt["appointment_date"]
-                    check_time = new_time or appt["appointment_time"]
-                    
-                    for other in self._mock_appointments:
-                        if (other["id"] != appointment_id and
-                            other["appointment_date"] == check_date and
-                            other["appointment_time"] == check_time and
-                            other["status"] == "booked"):
-                            return {
-                                "success": False,
-                                "error": "The new time slot is already booked."
-                            }
-                    
-                    if new_date:
-                        appt["appointment_date"] = new_date
-                    if new_time:
-                        appt["appointment_time"] = new_time
-                    
-                    return {"success": True, "appointment": appt}
-            
-            return {"success": False, "error": "Appointment not found."}
+            with self._cache_lock:
+                appt = self._mock_by_id.get(appointment_id)
+                if appt is None:
+                    return {"success": False, "error": "Appointment not found."}
+                if appt["user_phone"] != user_phone:
+                    return {
+                        "success": False,
+                        "error": "You don't have permission to modify this appointment."
+                    }
+                
+                # Check for conflicts if changing date/time
+                old_slot = (appt["appointment_date"], appt["appointment_time"])
+                new_slot = (new_date or old_slot[0], new_time or old_slot[1])
+                if self._mock_by_slot.get(new_slot, appointment_id) != appointment_id:
+                    return {
+                        "success": False,
+                        "error": "The new time slot is already booked."
+                    }
+                
+                if new_date:
+                    appt["appointment_date"] = new_date
+                if new_time:
+                    appt["appointment_time"] = new_time
+                if appt["status"] == "booked":
+                    self._mock_by_slot.pop(old_slot, None)
+                    self._mock_by_slot[new_slot] = appointment_id
+                
+                return {"success": True, "appointment": appt}
         
         try:
-            # Verify ownership
-            appointment = self.client.table("appointments").select("*").eq(
+            # Update appointment in one round-trip: user_phone in the filter
+            # verifies ownership, and the unique index on booked slots
+            # rejects conflicts
+            updates = {"updated_at": datetime.now().isoformat()}
+            if new_date:
+                updates["appointment_date"] = new_date
+            if new_time:
+                updates["appointment_time"] = new_time
+            
+            result = self.client.table("appointments").update(updates).eq(
                 "id", appointment_id
             ).eq("user_phone", user_phone).execute()
             
-            if not appointment.data:
+            if not result.data:
                 return {
                     "success": False,
                     "error": "Appointment not found or you don't have permission to modify it."
                 }
             
-            current = appointment.data[0]
-            check_date = new_date or current["appointment_date"]
-            check_time = new_time or current["appointment_time"]
-            
-            # Check for conflicts
-            existing = self.client.table("appointments").select("*").eq(
-                "appointment_date", check_date
-            ).eq("appointment_time", check_time).eq("status", "booked").neq(
-                "id", appointment_id
-            ).execute()
+            self._invalidate(user_phone)
+            return {"success": True, "appointment": result.data[0]}
             
-            if existing.data:
+        except Exception as e:
+            if _is_slot_conflict(e):
                 return {
                     "success": False,
                     "error": "The new time slot is already booked."
                 }
-            
-            # Update appointment
-            updates = {"updated_at": datetime.now().isoformat()}
-            if new_date:
-                updates["appointment_date"] = new_date
-            if new_time:
-                updates["appointment_time"] = new_time
-            
-            result = self.client.table("appointments").update(updates).eq(
-                "id", appointment_id
-            ).execute()
-            
-            return {"success": True, "appointment": result.data[0]}
-            
-        except Exception as e:
             return {"success": False, "error": str(e)}
 
 
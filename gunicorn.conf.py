@@ -0,0 +1,14 @@
+"""
+Gunicorn settings for the token server (picked up automatically from the CWD)
+Usage: gunicorn wsgi:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+worker_class = "gthread"
+workers = 2
+threads = 16
+keepalive = 30
+
+# Import the app (and parse .env) once in the master; workers inherit it via fork
+preload_app = True
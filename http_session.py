@@ -0,0 +1,10 @@
+"""
+Shared HTTP connection pool for outbound API calls
+One keep-alive session per process, so every avatar provider call
+reuses warm TCP/TLS connections instead of opening its own
+"""
+import requests
+
+# Per-host pools: pool_maxsize connections kept alive for each provider
+session = requests.Session()
+session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20))
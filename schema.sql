@@ -64,6 +64,30 @@ FOR ALL USING (true);
 CREATE POLICY "Allow backend service full access to logs" ON conversation_logs
 FOR ALL USING (true);
 
+-- TEST-ONLY: smoke test used by test_manual.py, not called by the app.
+-- Runs the full create/read/update/cancel lifecycle in one transaction
+-- (one round-trip) and returns the final row. It bypasses AppointmentDB,
+-- so the app's own insert/update/cancel paths are not covered by it.
+CREATE OR REPLACE FUNCTION crud_smoke_test(p_phone TEXT, p_date DATE, p_time TIME)
+RETURNS JSON AS $$
+DECLARE
+    appt appointments%ROWTYPE;
+BEGIN
+    INSERT INTO appointments (user_phone, user_name, appointment_date, appointment_time, status)
+    VALUES (p_phone, 'Manual Test User', p_date, p_time, 'booked')
+    RETURNING * INTO appt;
+    
+    SELECT * INTO STRICT appt FROM appointments WHERE id = appt.id;
+    
+    UPDATE appointments SET user_name = 'Updated Test User' WHERE id = appt.id;
+    
+    UPDATE appointments SET status = 'cancelled' WHERE id = appt.id
+    RETURNING * INTO appt;
+    
+    RETURN row_to_json(appt);
+END;
+$$ language 'plpgsql';
+
 -- Insert some test data (optional)
 -- Uncomment to add sample appointments
 /*
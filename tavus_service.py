@@ -2,15 +2,22 @@
 Tavus Avatar Service
 Handles Tavus API integration for creating conversational avatars
 """
-import os
+import orjson
 import requests
-from dotenv import load_dotenv
 
-load_dotenv()
+from config import CFG
+from http_session import session as _session
 
-TAVUS_API_KEY = os.getenv('TAVUS_API_KEY')
 TAVUS_API_BASE = "https://tavusapi.com/v2"
 
+_HEADERS = {
+    "x-api-key": CFG.tavus_api_key,
+    "Content-Type": "application/json"
+}
+_AUTH_HEADERS = {
+    "x-api-key": CFG.tavus_api_key
+}
+
 
 def create_conversation(persona_id=None):
     """
@@ -22,21 +29,16 @@ def create_conversation(persona_id=None):
     Returns:
         dict: Conversation details including conversation_url
     """
-    headers = {
-        "x-api-key": TAVUS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
     payload = {
-        "replica_id": persona_id or os.getenv('TAVUS_REPLICA_ID', 'r9fa0878977a'),
+        "replica_id": persona_id or CFG.tavus_replica_id,
         "conversation_name": "AI Appointment Assistant"
     }
     
     try:
-        response = requests.post(
+        response = _session.post(
             f"{TAVUS_API_BASE}/conversations",
-            headers=headers,
-            json=payload,
+            headers=_HEADERS,  # Already declares application/json
+            data=orjson.dumps(payload),
             timeout=10
         )
         response.raise_for_status()
@@ -67,14 +69,10 @@ def get_conversation_status(conversation_id):
     Returns:
         dict: Conversation status details
     """
-    headers = {
-        "x-api-key": TAVUS_API_KEY
-    }
-    
     try:
-        response = requests.get(
+        response = _session.get(
             f"{TAVUS_API_BASE}/conversations/{conversation_id}",
-            headers=headers,
+            headers=_AUTH_HEADERS,
             timeout=10
         )
         response.raise_for_status()
@@ -101,14 +99,10 @@ def end_conversation(conversation_id):
     Returns:
         dict: Success status
     """
-    headers = {
-        "x-api-key": TAVUS_API_KEY
-    }
-    
     try:
-        response = requests.delete(
+        response = _session.delete(
             f"{TAVUS_API_BASE}/conversations/{conversation_id}",
-            headers=headers,
+            headers=_AUTH_HEADERS,
             timeout=10
         )
         response.raise_for_status()
@@ -3,10 +3,16 @@ Simple test to verify LiveKit Agents can start.
 This is a minimal version without voice assistant complexity.
 """
 import os
-from dotenv import load_dotenv
+from config import load_env_once
 
 # Load environment
-load_dotenv()
+load_env_once()
+
+# Variables the agent worker needs
+ENV_KEYS = frozenset({
+    'LIVEKIT_URL', 'LIVEKIT_API_KEY', 'LIVEKIT_API_SECRET',
+    'DEEPGRAM_API_KEY', 'CARTESIA_API_KEY'
+})
 
 # Try importing livekit agents
 try:
@@ -34,9 +40,5 @@ except ImportError as e:
 
 print("\n✅ All basic imports working!")
 print("\nEnvironment variables check:")
-print(f"LIVEKIT_URL: {'✅ Set' if os.getenv('LIVEKIT_URL') else '❌ Missing'}")
-print(f"LIVEKIT_API_KEY: {'✅ Set' if os.getenv('LIVEKIT_API_KEY') else '❌ Missing'}")
-print(f"LIVEKIT_API_SECRET: {'✅ Set' if os.getenv('LIVEKIT_API_SECRET') else '❌ Missing'}")
-print(f"DEEPGRAM_API_KEY: {'✅ Set' if os.getenv('DEEPGRAM_API_KEY') else '❌ Missing'}")
-print(f"CARTESIA_API_KEY: {'✅ Set' if os.getenv('CARTESIA_API_KEY') else '❌ Missing'}")
-
+missing = ENV_KEYS - os.environ.keys()
+print(f"Missing: {', '.join(sorted(missing)) or 'none'} ({len(ENV_KEYS) - len(missing)}/{len(ENV_KEYS)} set)")
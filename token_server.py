@@ -2,17 +2,42 @@
 Simple token generation server for LiveKit
 Run this alongside your agent to generate access tokens for the frontend
 """
+import base64
+import functools
+import hashlib
+import hmac
 import os
+import secrets
+import threading
+import time
+import orjson
+from cachetools import TTLCache
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from livekit import api
-from dotenv import load_dotenv
-from beyond_presence_service import create_livekit_session
+from config import load_env_once
+# beyond_presence_service is imported inside the helper that uses it, so
+# worker boot and /health don't pay for it
 
 # Load environment
-load_dotenv()
+load_env_once()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson for jsonify and request parsing"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_INDENT_2 if kwargs.get('indent') else 0
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 # Enable CORS for frontend - allow localhost and Netlify domains
 CORS(app, origins=[
     "http://localhost:3000",
@@ -26,6 +51,109 @@ LIVEKIT_API_SECRET = os.getenv('LIVEKIT_API_SECRET')
 LIVEKIT_URL = os.getenv('LIVEKIT_URL')
 BEYOND_PRESENCE_AVATAR_ID = os.getenv('BEYOND_PRESENCE_AVATAR_ID', '2bc759ab-a7e5-4b91-941d-9e42450d6546')
 
+# Signed JWTs are reused for repeat (identity, room) requests, e.g. reconnect
+# loops. Tokens are valid for hours, so a cached one is at most a minute old.
+TOKEN_CACHE_SECONDS = 60
+_token_cache = TTLCache(maxsize=4096, ttl=TOKEN_CACHE_SECONDS)
+_token_cache_lock = threading.Lock()  # gunicorn gthread workers share the cache
+
+# Frontend retries of /avatar/create for the same room and token get the
+# session that was already created instead of a second Beyond Presence one
+AVATAR_SESSION_CACHE_SECONDS = 300
+_avatar_session_cache = TTLCache(maxsize=1024, ttl=AVATAR_SESSION_CACHE_SECONDS)
+_avatar_session_cache_lock = threading.Lock()
+
+
+# The JWT header never changes, so its base64url form is fixed:
+# {"alg":"HS256","typ":"JWT"}
+_HDR_B64 = b'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9'
+_SECRET_BYTES = (LIVEKIT_API_SECRET or '').encode()
+TOKEN_TTL_SECONDS = 6 * 60 * 60  # same default as livekit.api.AccessToken
+
+
+def _b64url(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=')
+
+
+@functools.lru_cache(maxsize=2048)
+def _make_grants(room_name):
+    """Room-join video claim; identity-free, so one shared dict per room"""
+    return {
+        'roomJoin': True,
+        'room': room_name,
+        'canPublish': True,
+        'canSubscribe': True,
+        'canPublishData': True,
+    }
+
+
+def _mint_token(identity, room_name):
+    """Return a room-join JWT for identity, signing a new one only on cache miss
+    
+    Claims match what livekit.api.AccessToken produces for the same grants;
+    the JWT is assembled and HS256-signed here instead of through the SDK.
+    """
+    if not (LIVEKIT_API_KEY and LIVEKIT_API_SECRET):
+        raise ValueError("api_key and api_secret must be set")
+    if not identity:
+        raise ValueError("identity and room must be set when joining a room")
+    
+    key = (identity, room_name)
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    now = int(time.time())
+    claims = {
+        'name': identity,
+        'video': _make_grants(room_name),
+        'sub': identity,
+        'iss': LIVEKIT_API_KEY,
+        'nbf': now,
+        'exp': now + TOKEN_TTL_SECONDS,
+    }
+    signing_input = _HDR_B64 + b'.' + _b64url(orjson.dumps(claims))
+    signature = hmac.new(_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    jwt_token = (signing_input + b'.' + _b64url(signature)).decode()
+    
+    with _token_cache_lock:
+        _token_cache[key] = jwt_token
+    return jwt_token
+
+
+def _get_or_create_avatar_session(room_name, livekit_token):
+    """Create a Beyond Presence session once per (room, token); failures aren't cached"""
+    from beyond_presence_service import create_livekit_session
+    
+    token_hash = hashlib.blake2b(livekit_token.encode(), digest_size=8).hexdigest()
+    key = (room_name, token_hash)
+    with _avatar_session_cache_lock:
+        cached = _avatar_session_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    result = create_livekit_session(
+        avatar_id=BEYOND_PRESENCE_AVATAR_ID,
+        livekit_url=LIVEKIT_URL,
+        livekit_token=livekit_token
+    )
+    
+    if result.get('success'):
+        with _avatar_session_cache_lock:
+            _avatar_session_cache[key] = result
+    return result
+
+
+def _request_json():
+    """Request body parsed with orjson; empty or '{}'-sized bodies skip parsing"""
+    length = request.content_length
+    if length is not None and length <= 2:
+        return {}
+    body = request.get_data()
+    return orjson.loads(body) if body else {}
+
+
 @app.route('/')
 def root():
     """Root route so we can confirm this is the token server (not the worker)."""
@@ -35,23 +163,13 @@ def root():
 def generate_token():
     """Generate a LiveKit access token for the frontend"""
     try:
-        data = request.get_json()
-        room_name = data.get('roomName', f'appointment-room-{os.urandom(4).hex()}')
+        data = _request_json()
+        # Only generate a room name when none was sent
+        room_name = data.get('roomName') or f'appointment-room-{secrets.token_hex(4)}'
         participant_name = data.get('participantName', 'User')
         
-        # Create token
-        token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
-        token.with_identity(participant_name)
-        token.with_name(participant_name)
-        token.with_grants(api.VideoGrants(
-            room_join=True,
-            room=room_name,
-            can_publish=True,
-            can_subscribe=True,
-        ))
-        
-        # Generate JWT
-        jwt_token = token.to_jwt()
+        # Create token (JWT)
+        jwt_token = _mint_token(participant_name, room_name)
         
         return jsonify({
             'token': jwt_token,
@@ -71,7 +189,7 @@ def health():
 def create_avatar_session():
     """Create a Beyond Presence avatar session connected to LiveKit"""
     try:
-        data = request.get_json() or {}
+        data = _request_json()
         room_name = data.get('roomName')
         livekit_token = data.get('token')
         
@@ -82,12 +200,8 @@ def create_avatar_session():
                 'fallback': True
             }), 400
         
-        # Create Beyond Presence session with LiveKit connection
-        result = create_livekit_session(
-            avatar_id=BEYOND_PRESENCE_AVATAR_ID,
-            livekit_url=LIVEKIT_URL,
-            livekit_token=livekit_token
-        )
+        # Create Beyond Presence session with LiveKit connection (reused on retry)
+        result = _get_or_create_avatar_session(room_name, livekit_token)
         
         if result.get('success'):
             return jsonify({
@@ -0,0 +1,8 @@
+"""
+WSGI entrypoint for the token server
+Production: gunicorn wsgi:app (settings in gunicorn.conf.py)
+Local dev: python token_server.py
+"""
+from token_server import app
+
+__all__ = ["app"]